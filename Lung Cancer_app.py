@@ -1,15 +1,16 @@
 # 📁 Folder Structure:
 # Lung-Cancer-Model-Deploy/
-# ├─ lung_cancer_app.py
+# ├─ Lung Cancer_app.py
 # ├─ lung_cancer_pipeline.pkl
+# ├─ feature_names.pkl
 # ├─ logo.png
-# ├─ feathered_bg.png   ✅ ← background image 
-# ├─ feathered_bg.png
+# ├─ static/background.webp   ✅ ← background image (served as a static file)
+# ├─ .streamlit/config.toml
 # └─ requirements.txt
 
 
 # =======================================
-# File: lung_cancer_app.py
+# File: Lung Cancer_app.py
 # =======================================
 
 
@@ -20,12 +21,12 @@
 # 🔹 Deployment: Streamlit Cloud or Local
 # 🔹 Features:
 #    ✅ Multilingual UI (EN, FR, AR, RU, UK)
-#    ✅ Upload CSV for batch prediction (with cleaning)
+#    ✅ Upload CSV, Parquet or Feather for batch prediction (with cleaning)
 #    ✅ Individual prediction form
 #    ✅ Threshold tuning (Max Recall & ROC)
-#    ✅ SHAP (KernelExplainer) OR Permutation toggle
+#    ✅ Permutation importance toggle (live on uploads, precomputed otherwise)
 #    ✅ Confidence bar chart
-#    ✅ Download results as CSV & PDF
+#    ✅ Download results as CSV, Parquet & PDF
 #    ✅ Email sending (placeholders included)
 #    ✅ Background image & logo supported
 # =========================================================
@@ -34,13 +35,26 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 import joblib
-import matplotlib.pyplot as plt
-import base64
-import smtplib
-from email.message import EmailMessage
-from sklearn.inspection import permutation_importance
+import altair as alt
+import copy
+import csv
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# ✅ Intel-accelerated sklearn kernels (optional; must run before sklearn imports
+# and before the pipeline is unpickled)
+try:
+    from sklearnex import patch_sklearn
+    patch_sklearn(verbose=False)
+except ImportError:
+    pass
+
+from joblib import Parallel, delayed
+from sklearn.ensemble import VotingClassifier
 from sklearn.metrics import roc_curve
-from fpdf import FPDF
+import pyarrow as pa
+from pyarrow import csv as pacsv, feather, ipc, parquet as pq
 
 # ----------------------------
 # ✅ Streamlit Configuration
@@ -48,21 +62,17 @@ from fpdf import FPDF
 st.set_page_config(page_title="Lung Cancer Diagnostics App", layout="centered")
 
 # ✅ Background Image & Logo
+# The background lives in ./static and is served by Streamlit's static file
+# server (.streamlit/config.toml), so the browser downloads and caches it once
+# rather than receiving a base64 copy inside the page on every rerun.
 @st.cache_data
-def get_base64_of_bin_file(bin_file):
-    try:
-        with open(bin_file, 'rb') as f:
-            return base64.b64encode(f.read()).decode()
-    except FileNotFoundError:
+def get_page_bg_css(image_file):
+    if not os.path.exists(os.path.join("static", image_file)):
         return None
-
-def set_png_as_page_bg(png_file):
-    bin_str = get_base64_of_bin_file(png_file)
-    if bin_str:
-        page_bg_img = f"""
+    return f"""
         <style>
         [data-testid="stAppViewContainer"] > .main {{
-            background-image: url("data:image/png;base64,{bin_str}");
+            background-image: url("app/static/{image_file}");
             background-size: cover;
             background-position: center;
             background-repeat: no-repeat;
@@ -70,21 +80,337 @@ def set_png_as_page_bg(png_file):
         }}
         </style>
         """
-        st.markdown(page_bg_img, unsafe_allow_html=True)
 
-set_png_as_page_bg("background.png")
+def set_image_as_page_bg(image_file):
+    page_bg_img = get_page_bg_css(image_file)
+    if page_bg_img:
+        st.markdown(page_bg_img, unsafe_allow_html=True)
 
-# ✅ Load Model & Features
-pipeline = joblib.load("lung_cancer_pipeline.pkl")
-feature_names = joblib.load("feature_names.pkl")
+set_image_as_page_bg("background.webp")
+
+# ✅ Load Model & Features (once per process, not on every rerun)
+@st.cache_resource
+def load_model(path):
+    return joblib.load(path)
+
+@st.cache_resource
+def load_feature_names(path):
+    return tuple(joblib.load(path))
+
+MODEL_PATH = "lung_cancer_pipeline.pkl"
+pipeline = load_model(MODEL_PATH)
+# Kept as the cached tuple: immutable, shared across reruns, and usable
+# directly as a cache key without re-converting it on every call
+feature_names = load_feature_names("feature_names.pkl")
+
+# ✅ Inference Model (Hummingbird-compiled when available, else sklearn)
+class ThreadedSoftVoting:
+    # Same output as the pipeline's soft-voting predict_proba, but the
+    # ensemble members (RF, LR, SVC) score concurrently instead of one after
+    # another; their predict_proba calls release the GIL in native code.
+    def __init__(self, pipeline, feature_names):
+        self.preprocess = pipeline[:-1]
+        self.feature_names = list(feature_names)
+        self.voting = pipeline[-1]
+        # The forest's trees are also walked in parallel, but on a shallow
+        # copy (the fitted trees are shared, not duplicated): the cached
+        # pipeline keeps its own n_jobs, so permutation_importance's worker
+        # processes don't each start a full-width thread pool of their own.
+        self.estimators = []
+        for name, est in zip(self.voting.named_estimators_, self.voting.estimators_):
+            if name == "rf":
+                est = copy.copy(est)
+                est.n_jobs = -1
+            self.estimators.append(est)
+
+    def predict_proba(self, X):
+        # The preprocessing was fitted on a DataFrame: the columns are named
+        # (a zero-copy view) so sklearn checks them against the fitted names.
+        Xt = self.preprocess.transform(pd.DataFrame(X, columns=self.feature_names, copy=False))
+        probas = Parallel(n_jobs=len(self.estimators), prefer="threads")(
+            delayed(est.predict_proba)(Xt) for est in self.estimators
+        )
+        return np.average(probas, axis=0, weights=self.voting.weights)
+
+@st.cache_resource
+def load_inference_model(_pipeline, feature_names):
+    # Compile the fitted pipeline to tensor ops once per process. Fall back
+    # to sklearn if Hummingbird isn't installed, can't convert one of the
+    # estimators, or disagrees with sklearn on a probe batch. Imported here
+    # so torch is only loaded when the model is, not on every cold start.
+    try:
+        from hummingbird.ml import convert as hb_convert
+    except ImportError:
+        hb_convert = None
+    if hb_convert is not None:
+        try:
+            compiled = hb_convert(_pipeline, "torch", extra_config={"tree_implementation": "gemm"})
+            # Probe rows drawn around the training data (the scaler's fitted
+            # mean and spread, rounded like the questionnaire answers), so
+            # AGE and the scores take realistic values rather than just 0/1.
+            n_features = len(feature_names)
+            scaler = _pipeline[0]
+            mean = getattr(scaler, "mean_", np.zeros(n_features))
+            scale = getattr(scaler, "scale_", np.ones(n_features))
+            probe = np.random.default_rng(0).normal(mean, scale, (256, n_features))
+            # Compared against sklearn on float64, the dtype it was fitted on
+            # and the one the app scores with.
+            probe = np.clip(np.round(probe), 0, None)
+            expected = _pipeline.predict_proba(pd.DataFrame(probe, columns=list(feature_names)))
+            if np.allclose(compiled.predict_proba(probe), expected, atol=1e-4):
+                return compiled
+        except Exception:
+            pass
+    voting = _pipeline[-1]
+    if isinstance(voting, VotingClassifier) and voting.voting == "soft":
+        return ThreadedSoftVoting(_pipeline, feature_names)
+    return _pipeline
+
+model = load_inference_model(pipeline, feature_names)
+
+# ✅ Batch Preprocessing & Scoring (cached on the uploaded bytes, so threshold
+# changes only re-apply the comparison instead of re-parsing and re-predicting)
+CSV_BLOCK_SIZE = 8 << 20  # bytes of CSV text per parallel parse block
+BATCH_ROWS = 256_000  # rows per batch handed to the encoder
+
+def iter_upload_batches(file_bytes, file_type, columns):
+    # Only the columns the model can use are read. Parquet and Feather are
+    # already typed and columnar, so they skip text parsing entirely; CSV goes
+    # through pyarrow's multithreaded C++ reader, which skips converting the
+    # rest. read_csv (unlike the streaming open_csv) settles each column's
+    # type over the whole file, so e.g. a 60.5 after a block of whole ages,
+    # or a value in a column that starts out blank, doesn't fail to convert.
+    source = io.BytesIO(file_bytes)
+    if file_type == "parquet":
+        parquet_file = pq.ParquetFile(source)
+        keep = [name for name in parquet_file.schema_arrow.names if name in columns]
+        yield from parquet_file.iter_batches(batch_size=BATCH_ROWS, columns=keep)
+    elif file_type == "feather":
+        keep = [name for name in ipc.open_file(source).schema.names if name in columns]
+        source.seek(0)
+        yield from feather.read_table(source, columns=keep).to_batches(max_chunksize=BATCH_ROWS)
+    else:
+        header = next(csv.reader([file_bytes.split(b"\n", 1)[0].decode("utf-8-sig")]), [])
+        keep = [name for name in header if name in columns]
+        table = pacsv.read_csv(
+            source,
+            read_options=pacsv.ReadOptions(block_size=CSV_BLOCK_SIZE),
+            # Blank text cells are missing values (as pandas reads them), not ""
+            convert_options=pacsv.ConvertOptions(include_columns=keep, strings_can_be_null=True),
+        )
+        yield from table.to_batches(max_chunksize=BATCH_ROWS)
+
+PREVIEW_ROWS = 5
+
+def read_preview(file_bytes, file_type):
+    # The preview shows the upload as given, every column included (IDs,
+    # labels, ...), so it reads the first rows on its own instead of taking
+    # them from the column-pruned model input.
+    source = io.BytesIO(file_bytes)
+    if file_type == "parquet":
+        batch = next(pq.ParquetFile(source).iter_batches(batch_size=PREVIEW_ROWS), None)
+        return None if batch is None else batch.to_pandas()
+    elif file_type == "feather":
+        reader = ipc.open_file(source)
+        if reader.num_record_batches == 0:
+            return None
+        return reader.get_batch(0).slice(0, PREVIEW_ROWS).to_pandas()
+    else:
+        return pd.read_csv(source, nrows=PREVIEW_ROWS)
+
+# Keyed on the file's content hash, so re-uploading the same file skips
+# parsing and encoding. Uploads are patient data: they are kept in memory only
+# (never written to disk) and only for the most recent few files.
+UPLOAD_CACHE_ENTRIES = 8
+
+@st.cache_data(max_entries=UPLOAD_CACHE_ENTRIES, show_spinner="Processing uploaded data...")
+def load_and_prep(file_bytes, feature_names, file_type="csv"):
+    # Encode the upload batch by batch: only one batch at a time is converted
+    # to pandas next to the compact feature matrix. Blanks are filled after
+    # the last batch, with each column's mean/mode over the whole upload, so
+    # a row's fill value doesn't depend on which batch it landed in.
+    feature_index, dummy_slots = feature_layout(feature_names)
+    used_columns = REQUIRED_COLS.union(feature_index, dummy_slots)
+    preview = read_preview(file_bytes, file_type)
+    blocks = []
+    text_counts, text_blanks = {}, {}
+    n_rows = 0
+    for batch in iter_upload_batches(file_bytes, file_type, used_columns):
+        chunk = clean_chunk(batch.to_pandas())
+        count_text_values(chunk, dummy_slots, text_counts, text_blanks, n_rows)
+        blocks.append(encode_features(chunk, feature_names))
+        n_rows += len(chunk)
+    if not blocks:
+        return preview, np.zeros((0, len(feature_names)), dtype=np.uint8)
+    X = np.vstack(blocks)
+    impute_missing(X, dummy_slots, text_counts, text_blanks)
+    return preview, compact_features(X)
+
+def compact_features(X):
+    # Nearly every feature is a 0/1 flag or a small integer score, so keep
+    # the cached matrix as uint8 whenever that is lossless; it is widened back
+    # to float64 (the pipeline's training dtype) only at the model boundary.
+    with np.errstate(invalid="ignore"):
+        X_small = X.astype(np.uint8)
+    return X_small if np.array_equal(X_small, X) else X
+
+REQUIRED_COLS = frozenset(['AGE','GENDER','SMOKING','ANXIETY','ALCOHOL CONSUMING','PEER_PRESSURE','COUGHING','SHORTNESS OF BREATH'])
+
+def clean_chunk(df_input):
+    # ✅ Data Cleaning (missing required columns added in one assign; blank
+    # values are imputed over the whole upload by impute_missing)
+    missing = REQUIRED_COLS.difference(df_input.columns)
+    if missing:
+        df_input = df_input.assign(**dict.fromkeys(sorted(missing), 0))
+    return df_input
+
+def count_text_values(df_input, dummy_slots, counts, blanks, offset):
+    # Running value counts of the one-hot encoded text columns, plus the
+    # upload-wide row numbers of their blanks, for the mode fill
+    for col, values in df_input.items():
+        if col in dummy_slots and not pd.api.types.is_numeric_dtype(values):
+            batch_counts = values.value_counts()
+            counts[col] = batch_counts.add(counts[col], fill_value=0) if col in counts else batch_counts
+            blanks.setdefault(col, []).append(np.flatnonzero(values.isna()) + offset)
+
+def impute_missing(X, dummy_slots, text_counts, text_blanks):
+    # Numeric blanks reach the matrix as NaN: fill each with its column mean.
+    nan_rows, nan_cols = np.nonzero(np.isnan(X))
+    if len(nan_rows):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = np.nansum(X, axis=0) / np.count_nonzero(~np.isnan(X), axis=0)
+        X[nan_rows, nan_cols] = means[nan_cols]
+    # Text blanks were encoded as all-zero dummies: set the slot of the
+    # column's mode (the smallest value on a tie, as pandas' mode picks).
+    for col, counts in text_counts.items():
+        rows = np.concatenate(text_blanks[col])
+        if len(rows) and len(counts):
+            mode = counts.index[counts == counts.max()].min()
+            idx = dummy_slots[col].get(mode)
+            if idx is not None:
+                X[rows, idx] = 1
+
+@st.cache_resource
+def feature_layout(feature_names):
+    # Computed once per model: the slot of every feature by name, plus the
+    # one-hot slots grouped by source column and value, e.g.
+    # "AGE_GROUP_Senior" -> dummy_slots["AGE_GROUP"]["Senior"].
+    feature_index = {name: i for i, name in enumerate(feature_names)}
+    dummy_slots = {}
+    for name, i in feature_index.items():
+        if "_" in name:
+            base, value = name.rsplit("_", 1)
+            dummy_slots.setdefault(base, {})[value] = i
+    return feature_index, dummy_slots
+
+def encode_features(df_input, feature_names):
+    # Fill the model's feature matrix in one pass: numeric columns are copied
+    # into their slot, text columns are one-hot encoded straight into the
+    # dummy slots the model actually uses. Unknown columns/values are ignored.
+    feature_index, dummy_slots = feature_layout(feature_names)
+    X = np.zeros((len(df_input), len(feature_names)))
+    for col, values in df_input.items():
+        if pd.api.types.is_numeric_dtype(values):
+            if col in feature_index:
+                X[:, feature_index[col]] = values.to_numpy(dtype=np.float64)
+        elif col in dummy_slots:
+            raw = values.to_numpy()
+            for value, idx in dummy_slots[col].items():
+                X[:, idx] = raw == value
+    return X
+
+# Bounded and in memory like the encoded upload; the model file's mtime is
+# part of the key so a retrained pipeline is never served stale probabilities.
+@st.cache_data(max_entries=UPLOAD_CACHE_ENTRIES)
+def compute_proba(_model, X, model_mtime):
+    # Questionnaire rows repeat a lot (mostly 0/1 answers), so score each
+    # distinct row once and broadcast back. Scoring runs in row batches so
+    # the float64 upcast and the pipeline's intermediates stay bounded. Rows
+    # go in as float64, the dtype the pipeline was fitted on (float32 inputs
+    # shift the scaled values and can flip predictions); only the output
+    # probabilities are kept as float32 (shown to two decimals anyway).
+    unique_rows, inverse = np.unique(X, axis=0, return_inverse=True)
+    unique_probs = np.empty(len(unique_rows), dtype=np.float32)
+    for start in range(0, len(unique_rows), BATCH_ROWS):
+        batch = unique_rows[start:start + BATCH_ROWS].astype(np.float64)
+        unique_probs[start:start + BATCH_ROWS] = _model.predict_proba(batch)[:, 1]
+    return unique_probs[inverse.reshape(-1)]
 
-# ✅ Expected Features
-expected_features = [
-    "AGE", "GENDER", "SMOKING", "YELLOW_FINGERS", "ANXIETY", "PEER_PRESSURE",
-    "CHRONIC DISEASE", "FATIGUE", "ALLERGY", "WHEEZING", "ALCOHOL CONSUMING",
-    "COUGHING", "SHORTNESS OF BREATH", "SWALLOWING DIFFICULTY", "CHEST PAIN",
-    "SYMPTOM_SCORE", "LIFESTYLE_SCORE", "LIFESTYLE_RISK", "AGE_GROUP_Senior", "AGE_GROUP_Middle-aged"
-]
+@st.cache_data
+def suggest_roc_threshold(probs):
+    fpr, tpr, thresholds = roc_curve((probs > 0.5).astype(int), probs)
+    youden_j = tpr - fpr
+    return thresholds[np.argmax(youden_j)]
+
+# Deterministic per (model file version, encoded upload), so a repeat request
+# is served from memory. Kept in memory only, and bounded, since the input is
+# patient data.
+IMPORTANCE_CACHE_ENTRIES = 8
+
+@st.cache_data(max_entries=IMPORTANCE_CACHE_ENTRIES, show_spinner="Calculating live permutation importance... please wait.")
+def compute_permutation_importance(_pipeline, X, model_mtime, sample_size=500):
+    from sklearn.inspection import permutation_importance
+
+    # Global importances are a mean over rows; a fixed random subsample gives
+    # the same ranking while bounding the cost for large uploads.
+    if len(X) > sample_size:
+        X = X[np.random.default_rng(0).choice(len(X), sample_size, replace=False)]
+    X = pd.DataFrame(X.astype(np.float64), columns=list(feature_names))
+    result = permutation_importance(
+        _pipeline, X, _pipeline.predict(X),
+        n_repeats=5, n_jobs=-1, random_state=42
+    )
+    return result.importances_mean
+
+# ✅ PDF Report (body written from one template in a single multi_cell;
+# cached per (prediction, probability), so repeat clicks reuse the bytes)
+PDF_REPORT_TEMPLATE = "Prediction: {label}\nProbability: {prob:.2f}"
+
+@st.cache_data(show_spinner=False)
+def build_pdf_report(pred, prob):
+    from fpdf import FPDF
+
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font("Arial", size=12)
+    pdf.cell(200, 10, txt="Lung Cancer Prediction Result", ln=True, align='C')
+    label = "LUNG CANCER" if pred else "NO LUNG CANCER"
+    pdf.multi_cell(200, 10, txt=PDF_REPORT_TEMPLATE.format(label=label, prob=prob))
+    return pdf.output(dest='S').encode('latin-1')
+
+# ✅ Charts (rendered client-side by Vega-Lite, no server-side PNG per rerun)
+@st.cache_data(show_spinner=False)
+def probability_bins(probs):
+    # The bins don't depend on the threshold, so slider moves reuse them
+    counts, edges = np.histogram(probs, bins=10, range=(0, 1))
+    return pd.DataFrame({"Probability": edges[:-1], "Bin End": edges[1:], "Count": counts})
+
+def probability_histogram(probs, threshold):
+    bars = alt.Chart(probability_bins(probs)).mark_bar(stroke="black").encode(
+        x=alt.X("Probability:Q", bin=alt.Bin(binned=True)), x2="Bin End:Q", y="Count:Q"
+    )
+    rule = alt.Chart(pd.DataFrame({"Threshold": [threshold]})).mark_rule(color="red", strokeDash=[4, 4]).encode(x="Threshold:Q")
+    return bars + rule
+
+def confidence_chart(prob):
+    conf_df = pd.DataFrame({
+        "Outcome": ["No Lung Cancer", "Lung Cancer"],
+        "Probability": [1 - prob, prob],
+    })
+    base = alt.Chart(conf_df, title="Prediction Confidence").encode(
+        x=alt.X("Outcome:N", sort=None, title=None),
+        y=alt.Y("Probability:Q", scale=alt.Scale(domain=[0, 1])),
+    )
+    bars = base.mark_bar().encode(
+        color=alt.Color("Outcome:N", scale=alt.Scale(range=["green", "red"]), legend=None)
+    )
+    labels = base.mark_text(dy=-8).encode(text=alt.Text("Probability:Q", format=".2f"))
+    return bars + labels
+
+def importance_chart(importance_df, title, color):
+    return alt.Chart(importance_df, title=title).mark_bar(color=color).encode(
+        x="Importance:Q", y=alt.Y("Feature:N", sort="-x")
+    )
 
 # ✅ Static Precomputed Permutation Importance
 importance_data = {
@@ -103,129 +429,135 @@ importance_data = {
     ]
 }
 
+@st.cache_data
+def load_static_importance():
+    # Built and sorted once, not on every rerun
+    return pd.DataFrame(importance_data).sort_values("Importance", ascending=False)
+
 # ✅ Language Translations
-def get_translation(language):
-    translations = {
-        "en": {
-            "title": "Lung Cancer Diagnostics Centre",
-            "subtitle": "By HasanSCULPT | DSA 2025",
-            "upload_csv": "Upload your CSV data",
-            "prediction_results": "Prediction Results",
-            "download_csv": "Download Results CSV",
-            "export": "Export Result",
-            "download_csv_single": "Download CSV",
-            "download_pdf": "Download PDF",
-            "enter_email": "Enter your email address to receive results",
-            "send_email": "Send Email",
-            "email_success": "✅ Email sent successfully!",
-            "email_fail": "❌ Failed to send email. Check configuration.",
-            "language_select": "🌍 Select Language",
-            "sidebar_title": "Navigate",
-            "individual_entry": "Please enter your medical/patient information below to predict whether you're likely to have Lung Cancer or not.",
-            "about_title": "📘 About Us",
-            "about_desc": """This app is developed by HasanSCULPT to assist in preliminary lung cancer risk prediction using ensemble machine learning based on symptomatic analytics and lifestyle.
+_TRANSLATIONS = {
+    "en": {
+        "title": "Lung Cancer Diagnostics Centre",
+        "subtitle": "By HasanSCULPT | DSA 2025",
+        "upload_csv": "Upload your CSV data",
+        "prediction_results": "Prediction Results",
+        "download_csv": "Download Results CSV",
+        "export": "Export Result",
+        "download_csv_single": "Download CSV",
+        "download_pdf": "Download PDF",
+        "enter_email": "Enter your email address to receive results",
+        "send_email": "Send Email",
+        "email_success": "✅ Email sent successfully!",
+        "email_fail": "❌ Failed to send email. Check configuration.",
+        "language_select": "🌍 Select Language",
+        "sidebar_title": "Navigate",
+        "individual_entry": "Please enter your medical/patient information below to predict whether you're likely to have Lung Cancer or not.",
+        "about_title": "📘 About Us",
+        "about_desc": """This app is developed by HasanSCULPT to assist in preliminary lung cancer risk prediction using ensemble machine learning based on symptomatic analytics and lifestyle.
             
 This Diagnostic application allows for:
 - Individual Prediction + Batch CSV upload with validation & cleaning
 - Confidence chart for individual predictions
-- Toggle for SHAP or Permutation Importance
+- Toggle for Permutation Importance
 
 Important: For accurate batch predictions, datasets must be cleaned and features properly encoded (1 = Lung Cancer, 0 = No Lung Cancer). Gender should also use numeric identifiers instead of text."""
-            ,
-            "contact_title": "📧 Contact Us",
-            "terms_title": "📜 Terms & Conditions",
-            "terms_text": "Disclaimer: This tool is for educational and diagnostic support only. Not a substitute for professional medical advice."
-        },
-        "fr": {
-            "title": "Centre de Diagnostic du Cancer du Poumon",
-            "subtitle": "Par HasanSCULPT | DSA 2025",
-            "upload_csv": "Téléchargez votre fichier CSV",
-            "prediction_results": "Résultats de la prédiction",
-            "download_csv": "Télécharger les résultats CSV",
-            "export": "Exporter le résultat",
-            "download_csv_single": "Télécharger CSV",
-            "download_pdf": "Télécharger PDF",
-            "enter_email": "Entrez votre adresse e-mail pour recevoir les résultats",
-            "send_email": "Envoyer l'e-mail",
-            "email_success": "✅ Email envoyé avec succès !",
-            "email_fail": "❌ Échec de l'envoi de l'e-mail.",
-            "language_select": "🌍 Sélectionnez la langue",
-            "sidebar_title": "Navigation",
-            "individual_entry": "Veuillez entrer les informations médicales du patient ci-dessous pour prédire la probabilité d'un cancer du poumon.",
-            "about_title": "📘 À propos de nous",
-            "about_desc": """Cette application, développée par HasanSCULPT, facilite la prédiction préliminaire du risque de cancer du poumon grâce à l'apprentissage automatique d'ensemble, basé sur l'analyse des symptômes et le mode de vie.""",
-            "contact_title": "📧 Contactez-nous",
-            "terms_title": "📜 Conditions générales",
-            "terms_text": "Avertissement : Cet outil est uniquement destiné à des fins éducatives et diagnostiques. Il ne remplace pas un avis médical professionnel certifié."
-        },
-        "ru": {
-            "title": "Центр Диагностики Рака Легких",
-            "subtitle": "ХасанСКАЛЬПТ | DSA 2025",
-            "upload_csv": "Загрузите ваш CSV файл",
-            "prediction_results": "Результаты прогноза",
-            "download_csv": "Скачать CSV с результатами",
-            "export": "Экспортировать результат",
-            "download_csv_single": "Скачать CSV",
-            "download_pdf": "Скачать PDF",
-            "enter_email": "Введите ваш email для получения результата",
-            "send_email": "Отправить email",
-            "email_success": "✅ Email успешно отправлен!",
-            "email_fail": "❌ Не удалось отправить Email.",
-            "language_select": "🌍 Выберите язык",
-            "sidebar_title": "Навигация",
-            "individual_entry": "Введите информацию о пациенте ниже для прогноза риска рака легких.",
-            "about_title": "📘 О нас",
-            "about_desc": "Это приложение разработано компанией HasanSCULPT для прогнозирования риска рака легких.",
-            "contact_title": "📧 Связаться с нами",
-            "terms_title": "📜 Условия использования",
-            "terms_text": "Отказ от ответственности: данный инструмент предназначен исключительно для образовательных и диагностических целей."
-        },
-        "ar": {
-            "title": "مركز تشخيص سرطان الرئة",
-            "subtitle": "بواسطة حسنSculpt | DSA 2025",
-            "upload_csv": "قم بتحميل ملف CSV الخاص بك",
-            "prediction_results": "نتائج التنبؤ",
-            "download_csv": "تحميل نتائج CSV",
-            "export": "تصدير النتيجة",
-            "download_csv_single": "تحميل CSV",
-            "download_pdf": "تحميل PDF",
-            "enter_email": "أدخل بريدك الإلكتروني لتلقي النتائج",
-            "send_email": "إرسال بريد إلكتروني",
-            "email_success": "✅ تم إرسال البريد الإلكتروني بنجاح!",
-            "email_fail": "❌ فشل في إرسال البريد الإلكتروني.",
-            "language_select": "🌍 اختر اللغة",
-            "sidebar_title": "القائمة الجانبية",
-            "individual_entry": "يرجى إدخال بياناتك الطبية أدناه للتنبؤ بخطر الإصابة بسرطان الرئة.",
-            "about_title": "📘 معلومات عنا",
-            "about_desc": "تم تطوير هذا التطبيق للمساعدة في التنبؤ بمخاطر الإصابة بسرطان الرئة باستخدام التعلم الآلي.",
-            "contact_title": "📧 تواصل معنا",
-            "terms_title": "📜 الشروط والأحكام",
-            "terms_text": "إخلاء مسؤولية: هذه الأداة مخصصة للأغراض التعليمية والدعم التشخيصي فقط."
-        },
-        "uk": {
-            "title": "Центр Діагностики Раку Легенів",
-            "subtitle": "ХасанСКАЛЬПТ | DSA 2025",
-            "upload_csv": "Завантажте свій CSV файл",
-            "prediction_results": "Результати прогнозу",
-            "download_csv": "Завантажити результати CSV",
-            "export": "Експортувати результат",
-            "download_csv_single": "Завантажити CSV",
-            "download_pdf": "Завантажити PDF",
-            "enter_email": "Введіть свою електронну пошту для отримання результатів",
-            "send_email": "Надіслати Email",
-            "email_success": "✅ Email успішно надіслано!",
-            "email_fail": "❌ Не вдалося надіслати Email.",
-            "language_select": "🌍 Виберіть мову",
-            "sidebar_title": "Навігація",
-            "individual_entry": "Введіть дані пацієнта для прогнозу ризику раку легень.",
-            "about_title": "📘 Про нас",
-            "about_desc": "Цей додаток допомагає прогнозувати ризик раку легень за допомогою ансамблевого машинного навчання.",
-            "contact_title": "📧 Зв'язатися з нами",
-            "terms_title": "📜 Умови використання",
-            "terms_text": "Цей інструмент призначений лише для освітньої та діагностичної підтримки."
-        }
+        ,
+        "contact_title": "📧 Contact Us",
+        "terms_title": "📜 Terms & Conditions",
+        "terms_text": "Disclaimer: This tool is for educational and diagnostic support only. Not a substitute for professional medical advice."
+    },
+    "fr": {
+        "title": "Centre de Diagnostic du Cancer du Poumon",
+        "subtitle": "Par HasanSCULPT | DSA 2025",
+        "upload_csv": "Téléchargez votre fichier CSV",
+        "prediction_results": "Résultats de la prédiction",
+        "download_csv": "Télécharger les résultats CSV",
+        "export": "Exporter le résultat",
+        "download_csv_single": "Télécharger CSV",
+        "download_pdf": "Télécharger PDF",
+        "enter_email": "Entrez votre adresse e-mail pour recevoir les résultats",
+        "send_email": "Envoyer l'e-mail",
+        "email_success": "✅ Email envoyé avec succès !",
+        "email_fail": "❌ Échec de l'envoi de l'e-mail.",
+        "language_select": "🌍 Sélectionnez la langue",
+        "sidebar_title": "Navigation",
+        "individual_entry": "Veuillez entrer les informations médicales du patient ci-dessous pour prédire la probabilité d'un cancer du poumon.",
+        "about_title": "📘 À propos de nous",
+        "about_desc": """Cette application, développée par HasanSCULPT, facilite la prédiction préliminaire du risque de cancer du poumon grâce à l'apprentissage automatique d'ensemble, basé sur l'analyse des symptômes et le mode de vie.""",
+        "contact_title": "📧 Contactez-nous",
+        "terms_title": "📜 Conditions générales",
+        "terms_text": "Avertissement : Cet outil est uniquement destiné à des fins éducatives et diagnostiques. Il ne remplace pas un avis médical professionnel certifié."
+    },
+    "ru": {
+        "title": "Центр Диагностики Рака Легких",
+        "subtitle": "ХасанСКАЛЬПТ | DSA 2025",
+        "upload_csv": "Загрузите ваш CSV файл",
+        "prediction_results": "Результаты прогноза",
+        "download_csv": "Скачать CSV с результатами",
+        "export": "Экспортировать результат",
+        "download_csv_single": "Скачать CSV",
+        "download_pdf": "Скачать PDF",
+        "enter_email": "Введите ваш email для получения результата",
+        "send_email": "Отправить email",
+        "email_success": "✅ Email успешно отправлен!",
+        "email_fail": "❌ Не удалось отправить Email.",
+        "language_select": "🌍 Выберите язык",
+        "sidebar_title": "Навигация",
+        "individual_entry": "Введите информацию о пациенте ниже для прогноза риска рака легких.",
+        "about_title": "📘 О нас",
+        "about_desc": "Это приложение разработано компанией HasanSCULPT для прогнозирования риска рака легких.",
+        "contact_title": "📧 Связаться с нами",
+        "terms_title": "📜 Условия использования",
+        "terms_text": "Отказ от ответственности: данный инструмент предназначен исключительно для образовательных и диагностических целей."
+    },
+    "ar": {
+        "title": "مركز تشخيص سرطان الرئة",
+        "subtitle": "بواسطة حسنSculpt | DSA 2025",
+        "upload_csv": "قم بتحميل ملف CSV الخاص بك",
+        "prediction_results": "نتائج التنبؤ",
+        "download_csv": "تحميل نتائج CSV",
+        "export": "تصدير النتيجة",
+        "download_csv_single": "تحميل CSV",
+        "download_pdf": "تحميل PDF",
+        "enter_email": "أدخل بريدك الإلكتروني لتلقي النتائج",
+        "send_email": "إرسال بريد إلكتروني",
+        "email_success": "✅ تم إرسال البريد الإلكتروني بنجاح!",
+        "email_fail": "❌ فشل في إرسال البريد الإلكتروني.",
+        "language_select": "🌍 اختر اللغة",
+        "sidebar_title": "القائمة الجانبية",
+        "individual_entry": "يرجى إدخال بياناتك الطبية أدناه للتنبؤ بخطر الإصابة بسرطان الرئة.",
+        "about_title": "📘 معلومات عنا",
+        "about_desc": "تم تطوير هذا التطبيق للمساعدة في التنبؤ بمخاطر الإصابة بسرطان الرئة باستخدام التعلم الآلي.",
+        "contact_title": "📧 تواصل معنا",
+        "terms_title": "📜 الشروط والأحكام",
+        "terms_text": "إخلاء مسؤولية: هذه الأداة مخصصة للأغراض التعليمية والدعم التشخيصي فقط."
+    },
+    "uk": {
+        "title": "Центр Діагностики Раку Легенів",
+        "subtitle": "ХасанСКАЛЬПТ | DSA 2025",
+        "upload_csv": "Завантажте свій CSV файл",
+        "prediction_results": "Результати прогнозу",
+        "download_csv": "Завантажити результати CSV",
+        "export": "Експортувати результат",
+        "download_csv_single": "Завантажити CSV",
+        "download_pdf": "Завантажити PDF",
+        "enter_email": "Введіть свою електронну пошту для отримання результатів",
+        "send_email": "Надіслати Email",
+        "email_success": "✅ Email успішно надіслано!",
+        "email_fail": "❌ Не вдалося надіслати Email.",
+        "language_select": "🌍 Виберіть мову",
+        "sidebar_title": "Навігація",
+        "individual_entry": "Введіть дані пацієнта для прогнозу ризику раку легень.",
+        "about_title": "📘 Про нас",
+        "about_desc": "Цей додаток допомагає прогнозувати ризик раку легень за допомогою ансамблевого машинного навчання.",
+        "contact_title": "📧 Зв'язатися з нами",
+        "terms_title": "📜 Умови використання",
+        "terms_text": "Цей інструмент призначений лише для освітньої та діагностичної підтримки."
     }
-    return translations.get(language, translations["en"])
+}
+
+def get_translation(language):
+    return _TRANSLATIONS.get(language, _TRANSLATIONS["en"])
 
 # ----------------------------
 # 🌐 Language Selector
@@ -260,22 +592,107 @@ page = st.sidebar.selectbox(tr['sidebar_title'], ["Prediction", "About", "Contac
 # ----------------------------
 # ✅ Email Setup (Placeholder)
 # ----------------------------
-def send_email(recipient_email, subject, body, attachment_path):
+SMTP_HOST = "smtp.gmail.com"
+SMTP_PORT = 465
+SMTP_USER = "your_email@example.com"
+SMTP_PASSWORD = "your_password"
+
+@st.cache_resource
+def get_smtp_client():
+    # One authenticated connection per process, so the TLS handshake and
+    # AUTH round trips are paid once rather than on every send.
+    import smtplib
+
+    smtp = smtplib.SMTP_SSL(SMTP_HOST, SMTP_PORT)
+    smtp.login(SMTP_USER, SMTP_PASSWORD)
+    return smtp
+
+@st.cache_resource
+def get_email_executor():
+    # A single worker sends in the background, so the page never waits on
+    # SMTP, and sends on the shared connection stay one at a time.
+    return ThreadPoolExecutor(max_workers=1)
+
+def send_email(recipient_email, subject, body, pdf_bytes):
+    import smtplib
+    from email.message import EmailMessage
+
     try:
         msg = EmailMessage()
         msg["Subject"] = subject
-        msg["From"] = "your_email@example.com"
+        msg["From"] = SMTP_USER
         msg["To"] = recipient_email
         msg.set_content(body)
-        with open(attachment_path, "rb") as f:
-            msg.add_attachment(f.read(), maintype="application", subtype="pdf", filename="prediction_result.pdf")
-        with smtplib.SMTP_SSL("smtp.gmail.com", 465) as smtp:
-            smtp.login("your_email@example.com", "your_password")
+        msg.add_attachment(pdf_bytes, maintype="application", subtype="pdf", filename="prediction_result.pdf")
+        try:
+            smtp = get_smtp_client()
+            # NOOP is a cheap health check, so a connection the server closed
+            # while idle is replaced before the message goes out.
+            if smtp.noop()[0] != 250:
+                raise smtplib.SMTPServerDisconnected("connection is no longer usable")
             smtp.send_message(msg)
+        except smtplib.SMTPServerDisconnected:
+            # The server dropped the idle connection; reconnect once and retry.
+            get_smtp_client.clear()
+            get_smtp_client().send_message(msg)
         return True
     except:
         return False
 
+@st.fragment(run_every=1)
+def email_status(email_future):
+    # Polls the background send; once it finishes, a full rerun shows the result
+    if email_future.done():
+        st.rerun()
+    st.info("Sending email...")
+
+# ----------------------------
+# ✅ Threshold & Batch Results
+# ----------------------------
+def threshold_slider():
+    # Sidebar Threshold (also drawn from inside the batch fragment, which
+    # Streamlit supports for st.sidebar since 1.59)
+    st.sidebar.subheader("🛠 Adjust Classification Threshold")
+    return st.sidebar.slider("Prediction Threshold", 0.0, 1.0, 0.5, 0.01, key="threshold")
+
+def batch_output_table(X_input, probs, threshold):
+    # Built straight from the arrays as an Arrow table (no pandas frame) and
+    # written by pyarrow's C++ writers
+    columns = {name: X_input[:, i] for i, name in enumerate(feature_names)}
+    columns["Probability"] = probs
+    columns["Prediction"] = np.greater(probs, threshold).view(np.int8)
+    return pa.table(columns)
+
+@st.cache_data(show_spinner=False)
+def batch_csv_bytes(X_input, probs, threshold):
+    buf = io.BytesIO()
+    pacsv.write_csv(batch_output_table(X_input, probs, threshold), buf)
+    return buf.getvalue()
+
+@st.cache_data(show_spinner=False)
+def batch_parquet_bytes(X_input, probs, threshold):
+    buf = io.BytesIO()
+    pq.write_table(batch_output_table(X_input, probs, threshold), buf, compression="zstd")
+    return buf.getvalue()
+
+@st.fragment
+def render_batch_predictions(X_input, probs):
+    # Only this block depends on the threshold, so moving the slider reruns
+    # just this fragment against the cached probabilities, not the script.
+    threshold = threshold_slider()
+
+    # ✅ Predictions (the bool mask reinterpreted as 0/1 int8, no second pass)
+    prediction = np.greater(probs, threshold).view(np.int8)
+
+    st.write(f"### {tr['prediction_results']}")
+    st.dataframe(pd.DataFrame({"Probability": probs, "Prediction": prediction}))
+    # The CSV is only serialized when the button is clicked
+    st.download_button("📥 " + tr['download_csv'], lambda: batch_csv_bytes(X_input, probs, threshold), "batch_predictions.csv", "text/csv")
+    st.download_button("📥 Download Parquet", lambda: batch_parquet_bytes(X_input, probs, threshold), "batch_predictions.parquet", "application/vnd.apache.parquet")
+
+    # Histogram
+    st.altair_chart(probability_histogram(probs, threshold))
+
 # ----------------------------
 # ✅ Page Routing
 # ----------------------------
@@ -292,88 +709,67 @@ elif page == "Terms":
     st.write(tr['terms_text'])
 
 elif page == "Prediction":
-    # Sidebar Threshold
-    st.sidebar.subheader("🛠 Adjust Classification Threshold")
-    threshold = st.sidebar.slider("Prediction Threshold", 0.0, 1.0, 0.5, 0.01)
-
     # Email input
     email = st.text_input(tr['enter_email'], key="email")
     if email and st.button(tr['send_email'], key="email_btn"):
-        success = send_email(email, tr['title'], "See attached result.", "prediction_result.pdf")
-        if success:
-            st.success(tr['email_success'])
-        else:
+        # Attaches the last individual report straight from memory
+        pdf_report = st.session_state.get("pdf_report")
+        if pdf_report is None:
             st.error(tr['email_fail'])
+        else:
+            st.session_state["email_future"] = get_email_executor().submit(
+                send_email, email, tr['title'], "See attached result.", pdf_report
+            )
+    email_future = st.session_state.get("email_future")
+    if email_future is not None:
+        if email_future.done():
+            del st.session_state["email_future"]
+            if email_future.result():
+                st.success(tr['email_success'])
+            else:
+                st.error(tr['email_fail'])
+        else:
+            email_status(email_future)
 
-    uploaded_file = st.sidebar.file_uploader(tr['upload_csv'], type="csv", key="csv")
+    uploaded_file = st.sidebar.file_uploader(tr['upload_csv'], type=["csv", "parquet", "feather"], key="csv")
     
     # ----------------------------
     # ✅ Batch Prediction Section
     # ----------------------------
     if uploaded_file:
-        df_input = pd.read_csv(uploaded_file)
+        preview, X_input = load_and_prep(uploaded_file.getvalue(), feature_names, uploaded_file.name.rsplit(".", 1)[-1].lower())
         st.write("### Preview of Uploaded Data")
-        st.dataframe(df_input.head())
-
-        # ✅ Data Cleaning
-        required_cols = ['AGE','GENDER','SMOKING','ANXIETY','ALCOHOL CONSUMING','PEER_PRESSURE','COUGHING','SHORTNESS OF BREATH']
-        for col in required_cols:
-            if col not in df_input.columns:
-                df_input[col] = 0
-        for col in df_input.columns:
-            if df_input[col].isnull().sum() > 0:
-                if df_input[col].dtype in ['int64','float64']:
-                    df_input[col].fillna(df_input[col].mean(), inplace=True)
-                else:
-                    df_input[col].fillna(df_input[col].mode()[0], inplace=True)   
-
-        # Align features
-        df_input = pd.get_dummies(df_input, drop_first=True)
-        for col in feature_names:
-            if col not in df_input:
-                df_input[col] = 0
-        df_input = df_input[feature_names]
+        st.dataframe(preview)
 
         # ✅ Automatic Threshold Suggestion
         st.write("### 🔍 Automatic Threshold Suggestions")
-        probs = pipeline.predict_proba(df_input)[:, 1]
-        fpr, tpr, thresholds = roc_curve((probs > 0.5).astype(int), probs)
-        youden_j = tpr - fpr
-        optimal_threshold = thresholds[np.argmax(youden_j)]
+        probs = compute_proba(model, X_input, os.path.getmtime(MODEL_PATH))
+        optimal_threshold = suggest_roc_threshold(probs)
         st.info(f"ROC-Optimal Threshold: {optimal_threshold:.2f}")
 
-        # ✅ Predictions
-        prediction = (probs > threshold).astype(int)
-        df_output = df_input.copy()
-        df_output["Probability"] = probs
-        df_output["Prediction"] = prediction
-
-        st.write(f"### {tr['prediction_results']}")
-        st.dataframe(df_output[["Probability", "Prediction"]])
-        st.download_button("📥 " + tr['download_csv'], df_output.to_csv(index=False), "batch_predictions.csv", "text/csv")
-
-        # Histogram
-        fig, ax = plt.subplots()
-        ax.hist(probs, bins=10, edgecolor='k')
-        ax.axvline(threshold, color='red', linestyle='--')
-        st.pyplot(fig)
+        render_batch_predictions(X_input, probs)
+    else:
+        threshold_slider()
 
     # ----------------------------
     # ✅ Individual Prediction Section
     # ----------------------------
     st.write("---")
     st.write(f"### {tr['individual_entry']}")
-    age = st.number_input("Age", 0, 100, 50)
-    gender = st.selectbox("Gender", ["Male", "Female"])
-    smoking = st.selectbox("Smoking", [0, 1])
-    anxiety = st.selectbox("Anxiety", [0, 1])
-    alcohol = st.selectbox("Alcohol Consuming", [0, 1])
-    peer_pressure = st.selectbox("Peer Pressure", [0, 1])
-    yellow_fingers = st.selectbox("yellow fingers", [0, 1])
-    wheezing = st.selectbox("wheezing", [0, 1])
-    cough = st.selectbox("Coughing", [0, 1])
-    short_breath = st.selectbox("Shortness of Breath", [0, 1])
-     # Auto-calculated scores
+    # Inside a form, edits don't rerun the script; only the submit button does
+    with st.form("individual_form"):
+        age = st.number_input("Age", 0, 100, 50)
+        gender = st.selectbox("Gender", ["Male", "Female"])
+        smoking = st.selectbox("Smoking", [0, 1])
+        anxiety = st.selectbox("Anxiety", [0, 1])
+        alcohol = st.selectbox("Alcohol Consuming", [0, 1])
+        peer_pressure = st.selectbox("Peer Pressure", [0, 1])
+        yellow_fingers = st.selectbox("yellow fingers", [0, 1])
+        wheezing = st.selectbox("wheezing", [0, 1])
+        cough = st.selectbox("Coughing", [0, 1])
+        short_breath = st.selectbox("Shortness of Breath", [0, 1])
+        submitted = st.form_submit_button("Predict Individual")
+     # Auto-calculated scores (from the last submitted answers)
     symptom_score = sum([cough, short_breath, wheezing, anxiety])
     lifestyle_score = sum([smoking, alcohol])
 
@@ -381,30 +777,24 @@ elif page == "Prediction":
     st.slider("SYMPTOM SCORE", 0, 10, symptom_score, key="symptom_slider", disabled=True)
     st.slider("LIFESTYLE SCORE", 0, 5, lifestyle_score, key="lifestyle_slider", disabled=True)
 
-    if st.button("Predict Individual"):
-        row = pd.DataFrame({'AGE': [age], 'GENDER': [1 if gender == "Male" else 0], 'SMOKING': [smoking],
-                            'ANXIETY': [anxiety], 'ALCOHOL CONSUMING': [alcohol], 'PEER_PRESSURE': [peer_pressure],
-                            'COUGHING': [cough], 'SHORTNESS OF BREATH': [short_breath],
-                            'SYMPTOM_SCORE': [symptom_score], 'LIFESTYLE_SCORE': [lifestyle_score]})
-        for col in feature_names:
-            if col not in row:
-                row[col] = 0
-        row = row[feature_names]
-
-        prob = pipeline.predict_proba(row)[0][1]
-        pred = int(prob > threshold)
+    if submitted:
+        feature_index, _ = feature_layout(feature_names)
+        row = np.zeros((1, len(feature_names)))
+        for col, value in {'AGE': age, 'GENDER': 1 if gender == "Male" else 0, 'SMOKING': smoking,
+                           'ANXIETY': anxiety, 'ALCOHOL CONSUMING': alcohol, 'PEER_PRESSURE': peer_pressure,
+                           'COUGHING': cough, 'SHORTNESS OF BREATH': short_breath,
+                           'SYMPTOM_SCORE': symptom_score, 'LIFESTYLE_SCORE': lifestyle_score}.items():
+            # Inputs the loaded model wasn't trained on are skipped
+            idx = feature_index.get(col)
+            if idx is not None:
+                row[0, idx] = value
+
+        prob = model.predict_proba(row)[0][1]
+        pred = int(prob > st.session_state["threshold"])
         st.success(f"{'🛑 LUNG CANCER' if pred == 1 else '✅ NO LUNG CANCER'} (Probability: {prob:.2f})")
 
         # ✅ Confidence Chart
-        fig, ax = plt.subplots()
-        bars = ax.bar(["No Lung Cancer", "Lung Cancer"], [1 - prob, prob], color=["green", "red"])
-        ax.set_ylim(0, 1)
-        ax.set_ylabel("Probability")
-        ax.set_title("Prediction Confidence")
-        for bar in bars:
-            yval = bar.get_height()
-            ax.text(bar.get_x() + bar.get_width() / 2.0, yval + 0.02, f"{yval:.2f}", ha='center')
-        st.pyplot(fig)
+        st.altair_chart(confidence_chart(prob))
 
         # ✅ Download Buttons
         result_df = pd.DataFrame({
@@ -414,35 +804,26 @@ elif page == "Prediction":
         st.download_button("📥 Download Result (CSV)", result_df.to_csv(index=False), "prediction_result.csv", "text/csv")
 
         # ✅ Export PDF
-        pdf = FPDF()
-        pdf.add_page()
-        pdf.set_font("Arial", size=12)
-        pdf.cell(200, 10, txt="Lung Cancer Prediction Result", ln=True, align='C')
-        pdf.cell(200, 10, txt=f"Prediction: {'LUNG CANCER' if pred else 'NO LUNG CANCER'}", ln=True)
-        pdf.cell(200, 10, txt=f"Probability: {prob:.2f}", ln=True)
-        pdf_bytes = pdf.output(dest='S').encode('latin-1')
+        pdf_bytes = build_pdf_report(pred, prob)
+        st.session_state["pdf_report"] = pdf_bytes
         st.download_button(label="📥 Download PDF", data=pdf_bytes, file_name="prediction_result.pdf", mime="application/pdf")
 
     # ----------------------------
     # ✅ Permutation Importance Toggle
     # ----------------------------
     if st.checkbox("Show Permutation Importance", key="perm_importance_toggle"):
-        try:
-            st.info("Calculating live permutation importance... please wait.")
-            result = permutation_importance(
-                pipeline, df_input, pipeline.predict(df_input),
-                n_repeats=5, random_state=42
-            )
-            sorted_idx = result.importances_mean.argsort()[::-1]
-            fig_live, ax_live = plt.subplots(figsize=(8, 6))
-            ax_live.barh(np.array(expected_features)[sorted_idx], result.importances_mean[sorted_idx], color="skyblue")
-            ax_live.set_title("Live Permutation Importance")
-            plt.tight_layout()
-            st.pyplot(fig_live)
-        except Exception:
-            st.warning("Live calculation failed. Showing static precomputed importance chart.")
-            fig_static, ax_static = plt.subplots(figsize=(8, 6))
-            ax_static.barh(importance_data["Feature"], importance_data["Importance"], color="orange")
-            ax_static.set_title("Static Permutation Importance (Precomputed)")
-            plt.tight_layout()
-            st.pyplot(fig_static)
+        if uploaded_file:
+            # Rows scored per permutation: smaller is faster, larger is more stable
+            sample_size = st.sidebar.slider("Importance sample size", 100, 2000, 500, 100, key="perm_sample_size")
+            try:
+                importances = compute_permutation_importance(pipeline, X_input, os.path.getmtime(MODEL_PATH), sample_size)
+                live_df = pd.DataFrame({"Feature": feature_names, "Importance": importances})
+                st.altair_chart(importance_chart(live_df, "Live Permutation Importance", "skyblue"))
+                if len(X_input) > sample_size:
+                    st.caption(f"Estimated on a random sample of {sample_size} of {len(X_input)} rows.")
+            except Exception:
+                st.warning("Live calculation failed. Showing static precomputed importance chart.")
+                st.altair_chart(importance_chart(load_static_importance(), "Static Permutation Importance (Precomputed)", "orange"))
+        else:
+            # No uploaded data to permute yet
+            st.altair_chart(importance_chart(load_static_importance(), "Static Permutation Importance (Precomputed)", "orange"))
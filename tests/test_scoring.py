@@ -0,0 +1,140 @@
+import sys
+import types
+import unittest
+import warnings
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from test_upload_parsing import load_app
+
+
+def sample_rows(pipeline, n_rows, n_distinct):
+    # Rows drawn around the training data (the scaler's fitted mean and
+    # spread, rounded like the questionnaire answers), with repeats.
+    scaler = pipeline[0]
+    rng = np.random.default_rng(1)
+    distinct = rng.normal(scaler.mean_, scaler.scale_, (n_distinct, len(scaler.mean_)))
+    distinct = np.clip(np.round(distinct), 0, None)
+    return distinct[rng.integers(0, n_distinct, n_rows)]
+
+
+class ScoringEquivalenceTest(unittest.TestCase):
+    # Every scoring path must match the fitted pipeline's own predict_proba on
+    # float64 input, the dtype it was trained on.
+    @classmethod
+    def setUpClass(cls):
+        cls.app = load_app()
+        cls.pipeline = cls.app.pipeline
+        cls.X = sample_rows(cls.pipeline, 2000, 300)
+
+    def baseline(self, X):
+        return self.pipeline.predict_proba(np.asarray(X, dtype=np.float64))[:, 1]
+
+    def test_compute_proba_dedup_and_batching(self):
+        X = self.app.compact_features(self.X)
+        with mock.patch.object(self.app, "BATCH_ROWS", 7):
+            probs = self.app.compute_proba.__wrapped__(self.app.model, X, 0.0)
+        self.assertEqual(probs.shape, (len(X),))
+        np.testing.assert_allclose(probs, self.baseline(self.X), rtol=0, atol=1e-6)
+
+    def test_compute_proba_non_integer_ages(self):
+        X = self.X.copy()
+        X[:, self.app.feature_names.index("AGE")] += 0.5
+        probs = self.app.compute_proba.__wrapped__(self.app.model, self.app.compact_features(X), 0.0)
+        np.testing.assert_allclose(probs, self.baseline(X), rtol=0, atol=1e-6)
+
+    def test_upload_cached_compact_scored_in_float64(self):
+        # The cached upload is uint8 (an eighth of the float64 bytes); only
+        # each scoring batch is widened, so predictions are unchanged.
+        data = pd.DataFrame(self.X, columns=self.app.feature_names).astype(int).to_csv(index=False).encode()
+        _, X = self.app.load_and_prep(data, self.app.feature_names, "csv")
+        self.assertEqual(X.dtype, np.uint8)
+        probs = self.app.compute_proba.__wrapped__(self.app.model, X, 0.0)
+        np.testing.assert_allclose(probs, self.baseline(self.X), rtol=0, atol=1e-6)
+
+    def test_encode_features(self):
+        # Reference encoding: one-hot the upload and align it to the model's
+        # features by name, scored as a DataFrame.
+        feature_names = list(self.app.feature_names)
+        numeric = [name for name in feature_names if not name.startswith("AGE_GROUP_")]
+        df = pd.DataFrame(self.X[:200], columns=feature_names)[numeric]
+        df["AGE_GROUP"] = np.where(df["AGE"] >= 60, "Senior", np.where(df["AGE"] >= 40, "Middle-aged", "Young"))
+        expected = pd.get_dummies(df).reindex(columns=feature_names, fill_value=0).astype(np.float64)
+
+        X = self.app.encode_features(df, self.app.feature_names)
+        self.assertEqual(X.dtype, np.float64)
+        np.testing.assert_array_equal(X, expected.to_numpy())
+        np.testing.assert_allclose(
+            self.app.model.predict_proba(X)[:, 1],
+            self.pipeline.predict_proba(expected)[:, 1],
+            rtol=0, atol=1e-12,
+        )
+
+    def test_threaded_soft_voting(self):
+        model = self.app.ThreadedSoftVoting(self.pipeline, self.app.feature_names)
+        np.testing.assert_allclose(model.predict_proba(self.X)[:, 1], self.baseline(self.X), rtol=0, atol=1e-12)
+
+    def test_threaded_soft_voting_leaves_pipeline_unchanged(self):
+        rf = self.pipeline[-1].named_estimators_["rf"]
+        n_jobs = rf.n_jobs
+        model = self.app.ThreadedSoftVoting(self.pipeline, self.app.feature_names)
+        self.assertEqual(rf.n_jobs, n_jobs)
+        self.assertEqual(model.estimators[0].n_jobs, -1)
+        self.assertIs(model.estimators[0].estimators_, rf.estimators_)
+
+    def test_scoring_passes_feature_names(self):
+        # No "X does not have valid feature names" warning from any path.
+        X = self.app.compact_features(self.X[:300])
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            self.app.model.predict_proba(self.X[:1])
+            self.app.compute_proba.__wrapped__(self.app.model, X, 0.0)
+            self.app.compute_permutation_importance.__wrapped__(self.pipeline, X, 0.0, 100)
+
+    def test_misnamed_features_are_rejected(self):
+        model = self.app.ThreadedSoftVoting(self.pipeline, reversed(self.app.feature_names))
+        with self.assertRaises(ValueError):
+            model.predict_proba(self.X)
+
+    def load_with_hummingbird(self, convert):
+        hummingbird = types.ModuleType("hummingbird")
+        hummingbird.ml = types.ModuleType("hummingbird.ml")
+        hummingbird.ml.convert = convert
+        modules = {"hummingbird": hummingbird, "hummingbird.ml": hummingbird.ml}
+        with mock.patch.dict(sys.modules, modules):
+            return self.app.load_inference_model.__wrapped__(self.pipeline, self.app.feature_names)
+
+    def test_fallback_when_conversion_fails(self):
+        def convert(*args, **kwargs):
+            raise RuntimeError("unsupported operator")
+
+        model = self.load_with_hummingbird(convert)
+        self.assertIsInstance(model, self.app.ThreadedSoftVoting)
+        np.testing.assert_allclose(model.predict_proba(self.X)[:, 1], self.baseline(self.X), rtol=0, atol=1e-12)
+
+    def test_compiled_model_checked_on_float64_probe(self):
+        probes = []
+
+        class Compiled:
+            def predict_proba(inner, X):
+                probes.append(X)
+                return self.pipeline.predict_proba(X)
+
+        model = self.load_with_hummingbird(lambda *args, **kwargs: Compiled())
+        self.assertIsInstance(model, Compiled)
+        self.assertEqual(probes[0].dtype, np.float64)
+
+    def test_fallback_when_compiled_model_disagrees(self):
+        class Drifting:
+            def predict_proba(self, X):
+                return np.full((len(X), 2), 0.5)
+
+        model = self.load_with_hummingbird(lambda *args, **kwargs: Drifting())
+        self.assertIsInstance(model, self.app.ThreadedSoftVoting)
+        np.testing.assert_allclose(model.predict_proba(self.X)[:, 1], self.baseline(self.X), rtol=0, atol=1e-12)
+
+
+if __name__ == "__main__":
+    unittest.main()
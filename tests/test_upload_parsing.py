@@ -0,0 +1,97 @@
+import importlib.util
+import os
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+REPO_DIR = Path(__file__).resolve().parents[1]
+APP_PATH = REPO_DIR / "Lung Cancer_app.py"
+
+
+def load_app():
+    # The app resolves the model files relative to the working directory.
+    cwd = os.getcwd()
+    os.chdir(REPO_DIR)
+    try:
+        spec = importlib.util.spec_from_file_location("lung_cancer_app", APP_PATH)
+        app = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(app)
+    finally:
+        os.chdir(cwd)
+    return app
+
+
+class CsvUploadTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = load_app()
+
+    def read_csv(self, text, columns):
+        # A tiny block size spreads the rows over many parse blocks.
+        block_size = self.app.CSV_BLOCK_SIZE
+        self.app.CSV_BLOCK_SIZE = 1 << 10
+        try:
+            batches = list(self.app.iter_upload_batches(text.encode(), "csv", columns))
+        finally:
+            self.app.CSV_BLOCK_SIZE = block_size
+        return pa.Table.from_batches(batches)
+
+    def test_float_after_integer_blocks(self):
+        text = "AGE,SMOKING\n" + "60,1\n" * 500 + "60.5,0\n"
+        table = self.read_csv(text, {"AGE", "SMOKING"})
+        self.assertEqual(table.num_rows, 501)
+        self.assertEqual(table.column("AGE")[-1].as_py(), 60.5)
+
+    def test_value_after_blank_blocks(self):
+        text = "AGE,AGE_GROUP\n" + "60,\n" * 500 + "70,Senior\n"
+        table = self.read_csv(text, {"AGE", "AGE_GROUP"})
+        self.assertEqual(table.num_rows, 501)
+        self.assertEqual(table.column("AGE_GROUP")[-1].as_py(), "Senior")
+
+
+class PreviewTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = load_app()
+        cls.upload = pd.DataFrame({"PATIENT_ID": ["p1", "p2"], "AGE": [61.0, 47.0], "SMOKING": [1, 0]})
+
+    def test_csv_preview_keeps_unused_columns(self):
+        data = self.upload.to_csv(index=False).encode()
+        preview, X = self.app.load_and_prep(data, self.app.feature_names, "csv")
+        self.assertEqual(list(preview.columns), list(self.upload.columns))
+        self.assertEqual(X.shape, (2, len(self.app.feature_names)))
+
+    def test_parquet_preview_keeps_unused_columns(self):
+        data = self.upload.to_parquet()
+        preview, X = self.app.load_and_prep(data, self.app.feature_names, "parquet")
+        self.assertEqual(list(preview.columns), list(self.upload.columns))
+        self.assertEqual(X.shape, (2, len(self.app.feature_names)))
+
+
+class ImputationTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = load_app()
+
+    def test_fill_values_span_all_batches(self):
+        # Each 3-row batch has its own mean AGE and most common AGE_GROUP;
+        # blanks must get the values over the whole upload instead.
+        upload = pd.DataFrame({
+            "AGE": [40, 42, None, 80, 82, None, 60, 61, 62],
+            "SMOKING": [1, 0, 1, 1, None, 0, 0, 1, 1],
+            "AGE_GROUP": ["Middle-aged", "Middle-aged", None, "Senior", "Senior", "Senior", "Senior", None, "Middle-aged"],
+        })
+        with mock.patch.object(self.app, "BATCH_ROWS", 3):
+            _, X = self.app.load_and_prep(upload.to_csv(index=False).encode(), self.app.feature_names, "csv")
+
+        filled = upload.fillna({"AGE": upload["AGE"].mean(), "SMOKING": upload["SMOKING"].mean(), "AGE_GROUP": "Senior"})
+        expected = self.app.encode_features(self.app.clean_chunk(filled), self.app.feature_names)
+        np.testing.assert_allclose(X, expected)
+
+
+if __name__ == "__main__":
+    unittest.main()